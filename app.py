@@ -3,8 +3,14 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
-from datetime import datetime
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import io
+import multiprocessing
+import os
+import threading
+import time
 
 try:
     import plotly.graph_objects as go
@@ -20,6 +26,21 @@ except:
     YFINANCE_AVAILABLE = False
     yf = None
 
+# Los 429 de Yahoo llegan como YFRateLimitError (no existe en versiones antiguas de yfinance)
+YFRateLimitError = None
+if YFINANCE_AVAILABLE:
+    try:
+        from yfinance.exceptions import YFRateLimitError
+    except:
+        pass
+
+try:
+    import requests
+    REQUESTS_AVAILABLE = True
+except:
+    REQUESTS_AVAILABLE = False
+    requests = None
+
 # ============================================================================
 # FUNCIONES DE CÁLCULO
 # ============================================================================
@@ -248,13 +269,543 @@ def clean_strikes(df):
     return df_clean
 
 
+# ============================================================================
+# LECTURA DE ARCHIVOS CSV
+# ============================================================================
+
+def _parse_process_threshold(value):
+    """
+    Convierte OI_PARSE_PROCESS_MB a bytes; None si no está definido o no es válido.
+    """
+    try:
+        megabytes = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not megabytes > 0:
+        return None
+    return int(megabytes * 1024 * 1024)
+
+
+# Archivos de al menos este tamaño (bytes) se parsean en procesos; None = solo hilos
+PARSE_PROCESS_THRESHOLD = _parse_process_threshold(os.environ.get('OI_PARSE_PROCESS_MB'))
+
+
+def _exp_date_from_name(name):
+    """
+    Extrae la fecha de vencimiento del nombre <TICKER>_..._<YYYY-MM-DD>.csv (None si no tiene).
+    """
+    try:
+        date_str = name.split('_')[-1].replace('.csv', '')
+        return datetime.strptime(date_str, '%Y-%m-%d')
+    except:
+        return None
+
+
+def parse_uploaded_file(name, data):
+    """
+    Parsea y clasifica un CSV subido (gamma_exposure, max_pain o OI Zones).
+    
+    No usa streamlit para poder ejecutarse en hilos o procesos; los errores se
+    devuelven en 'error' con el mismo mensaje que se muestra al usuario. Los archivos
+    sin fecha en el nombre quedan con 'dated' en False y exp_date en None.
+    """
+    result = {'name': name, 'df': None, 'exp_date': None, 'dated': False,
+              'gamma': None, 'max_pain': None, 'error': None}
+    
+    try:
+        df = pd.read_csv(io.BytesIO(data))
+        df.columns = df.columns.str.strip()
+        cols_lower = [str(col).lower() for col in df.columns]
+        
+        # Detectar gamma_exposure - debe tener "gamma" en el nombre de columnas
+        has_gamma = any('gamma' in col for col in cols_lower)
+        has_call = any('call' in col for col in cols_lower)
+        has_put = any('put' in col for col in cols_lower)
+        
+        if has_gamma and has_call and has_put:
+            result['gamma'] = df
+            # También procesar gamma como skew_analysis para mostrar en gráfico
+            # Convertir gamma a formato skew
+            cols_lower_dict = {col.lower(): col for col in df.columns}
+            
+            # Encontrar columnas de OI (obtener el nombre original, no la clave lowercase)
+            call_oi_col = next((cols_lower_dict[col] for col in cols_lower_dict if 'call' in col and 'oi' in col), None)
+            put_oi_col = next((cols_lower_dict[col] for col in cols_lower_dict if 'put' in col and 'oi' in col), None)
+            strike_col = next((cols_lower_dict[col] for col in cols_lower_dict if 'strike' in col), None)
+            
+            if strike_col and call_oi_col and put_oi_col:
+                # Crear registros skew a partir de gamma
+                df_skew = pd.DataFrame()
+                df_skew['strike'] = df[strike_col]
+                df_skew['option_type'] = 'CALL'
+                df_skew['open_interest'] = df[call_oi_col]
+                
+                df_skew_put = pd.DataFrame()
+                df_skew_put['strike'] = df[strike_col]
+                df_skew_put['option_type'] = 'PUT'
+                df_skew_put['open_interest'] = df[put_oi_col]
+                
+                df_combined = pd.concat([df_skew, df_skew_put], ignore_index=True)
+                result['df'] = clean_strikes(df_combined)
+                exp_date = _exp_date_from_name(name)
+                result['dated'] = exp_date is not None
+                result['exp_date'] = exp_date
+            return result
+        
+        # Detectar max_pain
+        has_total_loss = any('total_loss' in col or 'total loss' in col for col in cols_lower)
+        
+        if has_total_loss:
+            result['max_pain'] = df
+            return result
+        
+        # Procesar como archivo de OI Zones
+        required_cols = ['strike', 'option_type', 'open_interest']
+        # Buscar columnas case-insensitive
+        cols_lower_dict = {col.lower(): col for col in df.columns}
+        missing_cols = [col for col in required_cols if col not in cols_lower_dict]
+        
+        if missing_cols:
+            result['error'] = f"❌ {name} - Faltan columnas: {missing_cols}"
+            return result
+        
+        # Renombrar columnas a lowercase para procesamiento
+        rename_dict = {cols_lower_dict[col]: col for col in required_cols if col in cols_lower_dict}
+        df = df.rename(columns=rename_dict)
+        
+        df['option_type'] = df['option_type'].str.upper()
+        result['df'] = clean_strikes(df)
+        exp_date = _exp_date_from_name(name)
+        result['dated'] = exp_date is not None
+        result['exp_date'] = exp_date
+    except Exception as e:
+        result['error'] = f"❌ Error procesando {name}: {str(e)}"
+    
+    return result
+
+
+def parse_uploaded_files(files, max_workers=8, process_threshold=None, process_executor=None,
+                         on_broken_pool=None):
+    """
+    Parsea en paralelo una lista de (nombre, bytes) y devuelve los resultados en el mismo orden.
+    
+    El parser C de pandas libera el GIL, así que basta un pool de hilos; si se pasa
+    process_executor, los archivos de al menos process_threshold bytes se envían a él.
+    El pool de procesos lo gestiona quien llama (ver get_process_pool): si está roto,
+    esos archivos se reparsean en hilos y se llama a on_broken_pool.
+    
+    Los archivos sin fecha reciben aquí, en el hilo que llama y en orden de subida,
+    la hora actual más un microsegundo por posición, para que sus claves no choquen.
+    """
+    if not files:
+        return []
+    
+    large = set()
+    if process_executor is not None and process_threshold is not None:
+        large = {i for i, (_, data) in enumerate(files) if len(data) >= process_threshold}
+    futures = [None] * len(files)
+    pool_broken = False
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(files))) as executor:
+        for i, (name, data) in enumerate(files):
+            if i in large and not pool_broken:
+                try:
+                    futures[i] = process_executor.submit(parse_uploaded_file, name, data)
+                    continue
+                except BrokenProcessPool:
+                    pool_broken = True
+            futures[i] = executor.submit(parse_uploaded_file, name, data)
+        
+        results = []
+        for (name, data), future in zip(files, futures):
+            try:
+                try:
+                    results.append(future.result())
+                except BrokenProcessPool:
+                    pool_broken = True
+                    results.append(executor.submit(parse_uploaded_file, name, data).result())
+            except Exception as e:
+                results.append({'name': name, 'df': None, 'exp_date': None, 'dated': False, 'gamma': None,
+                                'max_pain': None, 'error': f"❌ Error procesando {name}: {str(e)}"})
+    
+    if pool_broken and on_broken_pool is not None:
+        on_broken_pool()
+    
+    now = datetime.now()
+    for i, result in enumerate(results):
+        if result['df'] is not None and not result['dated']:
+            result['exp_date'] = now + timedelta(microseconds=i)
+    
+    return results
+
+
+def merge_parse_results(results):
+    """
+    Fusiona los resultados en el orden de subida, igual que el procesamiento secuencial:
+    el último archivo gana para cada vencimiento y para max_pain/gamma.
+    
+    Devuelve (dfs_dict, df_max_pain, df_gamma, undated, errores).
+    """
+    dfs_dict = {}
+    df_max_pain = None
+    df_gamma = None
+    undated = set()
+    errors = []
+    
+    for result in results:
+        if result['error']:
+            errors.append(result['error'])
+            continue
+        if result['gamma'] is not None:
+            df_gamma = result['gamma']
+        if result['max_pain'] is not None:
+            df_max_pain = result['max_pain']
+        if result['df'] is not None:
+            dfs_dict[result['exp_date']] = result['df']
+            if not result['dated']:
+                undated.add(result['exp_date'])
+    
+    return dfs_dict, df_max_pain, df_gamma, undated, errors
+
+
+# ============================================================================
+# DESCARGA DE CADENAS DE OPCIONES
+# ============================================================================
+
+def normalize_chain(calls, puts):
+    """
+    Convierte calls/puts de un vencimiento al formato (strike, option_type, open_interest).
+    """
+    frames = []
+    for raw, option_type in ((calls, 'CALL'), (puts, 'PUT')):
+        df_raw = pd.DataFrame(raw)
+        if len(df_raw) == 0:
+            continue
+        df_side = pd.DataFrame()
+        df_side['strike'] = pd.to_numeric(df_raw['strike'], errors='coerce')
+        df_side['option_type'] = option_type
+        df_side['open_interest'] = pd.to_numeric(
+            df_raw.get('openInterest', df_raw.get('open_interest')), errors='coerce'
+        ).fillna(0)
+        frames.append(df_side.dropna(subset=['strike']))
+    
+    if not frames:
+        return pd.DataFrame(columns=['strike', 'option_type', 'open_interest'])
+    
+    return clean_strikes(pd.concat(frames, ignore_index=True))
+
+
+class RateLimiter:
+    """
+    Limita las peticiones a `rate` por segundo, compartido entre hilos.
+    """
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+    
+    def acquire(self):
+        if self.interval == 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def _make_session(pool_size):
+    """
+    Crea una sesión HTTP con pool de conexiones para reutilizarlas entre hilos.
+    """
+    if not REQUESTS_AVAILABLE:
+        return None
+    
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class YFinanceChainProvider:
+    """
+    Proveedor de cadenas de opciones desde Yahoo Finance.
+    
+    Usa la sesión propia de yfinance (compartida por todo el proceso); el tiempo por
+    vencimiento lo acota el plazo de fetch_option_chains.
+    """
+    def __init__(self):
+        self._tickers = {}
+        self._lock = threading.Lock()
+    
+    def _ticker(self, ticker):
+        # Un solo objeto Ticker por símbolo: cachea la lista de vencimientos
+        with self._lock:
+            if ticker not in self._tickers:
+                self._tickers[ticker] = yf.Ticker(ticker)
+            return self._tickers[ticker]
+    
+    def expirations(self, ticker):
+        return list(self._ticker(ticker).options)
+    
+    def fetch(self, ticker, expiration):
+        chain = self._ticker(ticker).option_chain(expiration)
+        return chain.calls, chain.puts
+
+
+class HTTPChainProvider:
+    """
+    Proveedor contra un servidor HTTP de fixtures grabados (tests sin red).
+    
+    Rutas: GET {base_url}/{ticker}/expirations -> ["YYYY-MM-DD", ...]
+           GET {base_url}/{ticker}/{YYYY-MM-DD} -> {"calls": [...], "puts": [...]}
+    """
+    def __init__(self, base_url, pool_size=8, timeout=10.0):
+        self.base_url = base_url.rstrip('/')
+        self.session = _make_session(pool_size)
+        self.timeout = timeout
+    
+    def expirations(self, ticker):
+        response = self.session.get(f"{self.base_url}/{ticker}/expirations", timeout=self.timeout)
+        response.raise_for_status()
+        return list(response.json())
+    
+    def fetch(self, ticker, expiration):
+        response = self.session.get(f"{self.base_url}/{ticker}/{expiration}", timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        return data.get('calls', []), data.get('puts', [])
+
+
+@st.cache_resource
+def get_chain_provider():
+    """
+    Devuelve el proveedor configurado: fixtures si OI_CHAIN_FIXTURE_URL está definido, si no Yahoo Finance.
+    
+    Se crea una sola vez por proceso para reutilizar la sesión y los Ticker entre reruns.
+    """
+    fixture_url = os.environ.get('OI_CHAIN_FIXTURE_URL')
+    if fixture_url and REQUESTS_AVAILABLE:
+        return HTTPChainProvider(fixture_url)
+    if YFINANCE_AVAILABLE:
+        return YFinanceChainProvider()
+    return None
+
+
+def _is_transient(error):
+    """
+    Indica si un error de descarga merece reintento (conexión, timeout, 429 o 5xx).
+    """
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    if YFRateLimitError is not None and isinstance(error, YFRateLimitError):
+        return True
+    if not REQUESTS_AVAILABLE:
+        return False
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return False
+
+
+def fetch_option_chains(ticker, provider, expirations=None, max_expirations=None,
+                        max_workers=8, rate_limit=5.0, retries=3, backoff=0.5, timeout=20.0):
+    """
+    Descarga en paralelo los vencimientos pedidos y los normaliza al formato de dfs_dict.
+    
+    Cada vencimiento tiene un plazo de `timeout` segundos desde que empieza su descarga:
+    solo se reintentan errores transitorios y nunca después del plazo (el intento en curso
+    puede excederlo como mucho el timeout por petición del proveedor).
+    
+    Devuelve (dfs_dict, errores) donde errores es {vencimiento: mensaje}.
+    """
+    if expirations is None:
+        expirations = provider.expirations(ticker)
+    if max_expirations:
+        expirations = expirations[:max_expirations]
+    
+    limiter = RateLimiter(rate_limit)
+    
+    def fetch_one(expiration):
+        exp_date = datetime.strptime(expiration, '%Y-%m-%d')
+        deadline = time.monotonic() + timeout
+        
+        for attempt in range(retries + 1):
+            if attempt > 0:
+                delay = backoff * 2 ** (attempt - 1)
+                if time.monotonic() + delay >= deadline:
+                    raise TimeoutError(f"timeout de {timeout:g}s tras {attempt} intentos: {last_error}")
+                time.sleep(delay)
+            limiter.acquire()
+            try:
+                calls, puts = provider.fetch(ticker, expiration)
+                return exp_date, normalize_chain(calls, puts)
+            except Exception as e:
+                if not _is_transient(e):
+                    raise
+                last_error = e
+        raise last_error
+    
+    dfs_dict = {}
+    errors = {}
+    
+    if not expirations:
+        return dfs_dict, errors
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(expirations))) as executor:
+        futures = [(exp, executor.submit(fetch_one, exp)) for exp in expirations]
+        # Resultados en el orden de los vencimientos, independientemente del orden de llegada
+        for expiration, future in futures:
+            try:
+                exp_date, df_exp = future.result()
+            except Exception as e:
+                errors[expiration] = str(e)
+                continue
+            if len(df_exp) > 0:
+                dfs_dict[exp_date] = df_exp
+    
+    return dfs_dict, errors
+
+# ============================================================================
+# AGRUPACIÓN DE VENCIMIENTOS POR DTE
+# ============================================================================
+
+EXPIRED_BUCKET = 'Vencidos'
+UNDATED_BUCKET = 'Sin fecha'
+
+
+def default_dte_buckets(today=None):
+    """
+    Buckets por defecto como (etiqueta, DTE máximo inclusive); None = sin límite.
+    """
+    today = today or datetime.now()
+    end_of_week = 6 - today.weekday()
+    return [
+        ('0DTE', 0),
+        ('Semana', end_of_week),
+        ('Próx. semana', end_of_week + 7),
+        ('Mensual', 45),
+        ('Trimestral', 120),
+        ('LEAPS', None),
+    ]
+
+
+def _parse_dte_buckets(value):
+    """
+    Convierte OI_DTE_BUCKETS ("0DTE:0,Mensual:45,LEAPS") en [(etiqueta, DTE máximo)].
+    
+    Un bucket sin ":" no tiene límite. None si no está definido o no es válido.
+    """
+    if not value:
+        return None
+    
+    buckets = []
+    try:
+        for item in value.split(','):
+            if ':' in item:
+                label, max_dte = item.rsplit(':', 1)
+                max_dte = int(max_dte)
+                if max_dte < 0:
+                    return None
+            else:
+                label, max_dte = item, None
+            label = label.strip()
+            if not label:
+                return None
+            buckets.append((label, max_dte))
+    except ValueError:
+        return None
+    
+    return tuple(buckets)
+
+
+# Buckets configurados por entorno; None = default_dte_buckets()
+DTE_BUCKETS = _parse_dte_buckets(os.environ.get('OI_DTE_BUCKETS'))
+
+
+def assign_dte_bucket(exp_date, buckets, today):
+    """
+    Devuelve la etiqueta del primer bucket que contiene el vencimiento.
+    
+    Los vencimientos pasados (exportaciones antiguas) van a EXPIRED_BUCKET, nunca a 0DTE.
+    """
+    dte = (exp_date.date() - today.date()).days
+    if dte < 0:
+        return EXPIRED_BUCKET
+    for label, max_dte in buckets:
+        if max_dte is None or dte <= max_dte:
+            return label
+    return None
+
+
+def build_rollups(dfs_dict, buckets=None, today=None, undated=()):
+    """
+    Suma el OI de los vencimientos de cada bucket sobre una rejilla de strikes común.
+    
+    Las claves de `undated` (archivos sin fecha) van a UNDATED_BUCKET.
+    
+    Devuelve (rollups, members): rollups {etiqueta: df} en el orden de los buckets,
+    con el formato (strike, option_type, open_interest), y members {etiqueta: [vencimientos]}.
+    """
+    today = today or datetime.now()
+    buckets = buckets or default_dte_buckets(today)
+    undated = set(undated)
+    
+    grid = np.unique(np.concatenate([df['strike'].to_numpy(dtype=float) for df in dfs_dict.values()]))
+    labels = [EXPIRED_BUCKET] + [label for label, _ in buckets] + [UNDATED_BUCKET]
+    call_oi = {label: np.zeros(len(grid)) for label in labels}
+    put_oi = {label: np.zeros(len(grid)) for label in labels}
+    present = {label: np.zeros(len(grid), dtype=bool) for label in labels}
+    members = {label: [] for label in labels}
+    
+    for exp_date in sorted(dfs_dict.keys()):
+        if exp_date in undated:
+            label = UNDATED_BUCKET
+        else:
+            label = assign_dte_bucket(exp_date, buckets, today)
+        if label is None:
+            continue
+        
+        df_exp = dfs_dict[exp_date]
+        idx = np.searchsorted(grid, df_exp['strike'].to_numpy(dtype=float))
+        oi = np.nan_to_num(df_exp['open_interest'].to_numpy(dtype=float))
+        is_call = (df_exp['option_type'] == 'CALL').to_numpy()
+        is_put = (df_exp['option_type'] == 'PUT').to_numpy()
+        
+        np.add.at(call_oi[label], idx[is_call], oi[is_call])
+        np.add.at(put_oi[label], idx[is_put], oi[is_put])
+        present[label][idx] = True
+        members[label].append(exp_date)
+    
+    rollups = {}
+    for label in labels:
+        if not members[label]:
+            continue
+        
+        mask = present[label]
+        strikes = grid[mask]
+        rollups[label] = pd.DataFrame({
+            'strike': np.concatenate([strikes, strikes]),
+            'option_type': ['CALL'] * len(strikes) + ['PUT'] * len(strikes),
+            'open_interest': np.concatenate([call_oi[label][mask], put_oi[label][mask]]),
+        })
+    
+    return rollups, {label: exps for label, exps in members.items() if exps}
+
+
 # ============================================================================
 # FUNCIÓN PRINCIPAL DE GENERACIÓN DE GRÁFICO
 # ============================================================================
 
-def generate_chart(dfs_dict, ticker, spot=None, max_pain=None, gamma_exposure=None):
+def generate_chart(dfs_dict, ticker, spot=None, max_pain=None, gamma_exposure=None, rollup=False):
     """
     Genera el gráfico PNG con todas las especificaciones.
+    
+    Con rollup=True las claves de dfs_dict son etiquetas de bucket y se respeta su orden.
     """
     
     fig_width = 17.92
@@ -284,8 +835,12 @@ def generate_chart(dfs_dict, ticker, spot=None, max_pain=None, gamma_exposure=No
     ax_main.set_yticks(all_strikes[::max(1, len(all_strikes)//10)])
     ax_main.tick_params(axis='y', colors='white', labelsize=9)
     
-    expirations = sorted(dfs_dict.keys())
-    date_labels = [exp.strftime('%Y-%m-%d') for exp in expirations]
+    if rollup:
+        expirations = list(dfs_dict.keys())
+        date_labels = expirations
+    else:
+        expirations = sorted(dfs_dict.keys())
+        date_labels = [exp.strftime('%Y-%m-%d') for exp in expirations]
     ax_main.set_xticks(range(1, len(expirations) + 1))
     ax_main.set_xticklabels(date_labels, rotation=45, ha='right', color='gray', fontsize=10)
     
@@ -527,10 +1082,186 @@ st.set_page_config(
     layout="wide"
 )
 
+
+# Los reruns de streamlit (checkbox, selectbox, descarga) reutilizan estos resultados
+
+@st.cache_resource
+def get_process_pool():
+    """
+    Pool de procesos para archivos grandes, creado una vez por servidor.
+    
+    Usa "spawn": hacer fork desde el servidor multihilo de streamlit puede bloquearse.
+    Cada worker reimporta app.py (sin ejecutar main()), así que el primer uso es más lento.
+    """
+    return ProcessPoolExecutor(max_workers=min(4, os.cpu_count() or 1),
+                               mp_context=multiprocessing.get_context('spawn'))
+
+
+@st.cache_data(ttl=3600, max_entries=8, show_spinner=False)
+def load_uploaded_files(files, process_threshold):
+    process_executor = get_process_pool() if process_threshold is not None else None
+    # Si un worker muere, el pool queda roto: descartarlo para que el siguiente uso cree otro
+    return parse_uploaded_files(files, process_threshold=process_threshold, process_executor=process_executor,
+                                on_broken_pool=get_process_pool.clear)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def load_rollups(dfs_dict, today_date, undated, buckets=None):
+    today = datetime.combine(today_date, datetime.min.time())
+    return build_rollups(dfs_dict, buckets=list(buckets) if buckets else None, today=today, undated=undated)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def load_global_pivot(df_all):
+    return calculate_global_pivot(df_all)
+
+
+@st.cache_data(ttl=60, max_entries=64, show_spinner=False)
+def load_current_price(ticker):
+    return get_current_price(ticker)
+
+
+# Un PNG por cada spot distinto: acotado para que el precio en vivo no haga crecer la caché
+@st.cache_data(ttl=600, max_entries=32, show_spinner=False)
+def render_chart_png(chart_dict, ticker, spot=None, max_pain=None, gamma_exposure=None, rollup=False):
+    """
+    Genera el gráfico y lo devuelve como PNG.
+    """
+    fig = generate_chart(chart_dict, ticker, spot, max_pain, gamma_exposure, rollup=rollup)
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=150, facecolor='black')
+    plt.close(fig)
+    return buf.getvalue()
+
+def render_results(dfs_dict, ticker, df_max_pain=None, df_gamma=None, undated=()):
+    """
+    Muestra métricas, gráfico y botón de descarga para los vencimientos cargados.
+    """
+    df_all = pd.concat(dfs_dict.values(), ignore_index=True)
+    
+    spot_auto = load_global_pivot(df_all)
+    price_live = load_current_price(ticker)
+    spot = price_live if price_live else spot_auto
+    
+    max_pain = find_max_pain(df_max_pain)
+    gamma_exposure = find_gamma_exposure(df_gamma)
+    
+    # Métricas principales - solo las más importantes
+    col1, col2, col3, col4, col5, col6, col7, col8 = st.columns(8)
+    with col1:
+        st.metric("Ticker", ticker)
+    with col2:
+        st.metric("SPOT", f"${spot:.2f}" if spot else "N/A")
+    with col3:
+        st.metric("PIVOT", f"${spot_auto:.2f}")
+    with col4:
+        st.metric("Vencimientos", len(dfs_dict))
+    with col5:
+        total_oi = df_all['open_interest'].sum()
+        st.metric("Total OI", f"{int(total_oi):,}")
+    with col6:
+        call_oi = df_all[df_all['option_type'] == 'CALL']['open_interest'].sum()
+        st.metric("OI CALLS", f"{int(call_oi):,}")
+    with col7:
+        put_oi = df_all[df_all['option_type'] == 'PUT']['open_interest'].sum()
+        st.metric("OI PUTS", f"{int(put_oi):,}")
+    with col8:
+        total_strikes = len(df_all['strike'].unique())
+        call_put_ratio = call_oi / put_oi if put_oi > 0 else 0
+        st.metric("C/P Ratio", f"{call_put_ratio:.2f}")
+    
+    # Con muchos vencimientos se agrupan por DTE: el coste escala con los buckets
+    rollup = st.checkbox("Agrupar vencimientos por DTE", value=len(dfs_dict) > 12, key="rollup_dte")
+    if rollup:
+        chart_dict, members = load_rollups(dfs_dict, datetime.now().date(), tuple(sorted(undated)), DTE_BUCKETS)
+    else:
+        chart_dict, members = dfs_dict, {}
+    
+    with st.spinner("Generating chart..."):
+        png = render_chart_png(chart_dict, ticker, spot, max_pain, gamma_exposure, rollup=rollup)
+        
+        st.image(png, use_container_width=True)
+        
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col2:
+            st.download_button(
+                label="⬇️ Download PNG",
+                data=png,
+                file_name=f"{ticker}_OI_Zones_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
+                mime="image/png",
+                use_container_width=True
+            )
+    
+    if members:
+        # Detalle por vencimiento solo bajo demanda
+        options = ["—"] + [f"{label} ({len(exps)})" for label, exps in members.items()]
+        choice = st.selectbox("Detalle por vencimiento", options, key="rollup_detail")
+        label = choice.rsplit(' (', 1)[0]
+        if label in members:
+            with st.spinner("Generating chart..."):
+                detail = {exp: dfs_dict[exp] for exp in members[label]}
+                png_detail = render_chart_png(detail, f"{ticker} {label}", spot, max_pain, gamma_exposure)
+                st.image(png_detail, use_container_width=True)
+
+
+def fetch_mode():
+    """
+    Descarga las cadenas de opciones del ticker sin necesidad de exportar CSV.
+    """
+    provider = get_chain_provider()
+    if provider is None:
+        st.error("❌ yfinance no está disponible para descargar cadenas de opciones")
+        return
+    
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        ticker = st.text_input("Ticker", value="SPY", key="fetch_ticker").strip().upper()
+    with col2:
+        max_expirations = st.number_input("Vencimientos", min_value=1, max_value=100, value=40, step=1)
+    with col3:
+        st.write("")
+        fetch_clicked = st.button("Descargar", use_container_width=True)
+    
+    if fetch_clicked and ticker:
+        try:
+            with st.spinner(f"Descargando cadenas de opciones de {ticker}..."):
+                dfs_dict, errors = fetch_option_chains(ticker, provider, max_expirations=int(max_expirations))
+            st.session_state['fetched_chains'] = (ticker, dfs_dict, errors)
+        except Exception as e:
+            st.error(f"❌ Error descargando {ticker}: {str(e)}")
+            return
+    
+    # Conservar la descarga entre reruns (p. ej. al pulsar Download PNG)
+    fetched = st.session_state.get('fetched_chains')
+    if not fetched or fetched[0] != ticker:
+        return
+    
+    _, dfs_dict, errors = fetched
+    for expiration, message in errors.items():
+        st.error(f"❌ Error descargando {ticker} {expiration}: {message}")
+    
+    if not dfs_dict:
+        st.error(f"❌ No se encontraron cadenas de opciones para {ticker}")
+    else:
+        render_results(dfs_dict, ticker)
+
+
 def main():
     # Título minimalista
     st.markdown("<h1 style='text-align: center;'>OI ZONES</h1>", unsafe_allow_html=True)
     
+    source = st.radio(
+        "Fuente de datos",
+        ["CSV", "Yahoo Finance"],
+        horizontal=True,
+        key="data_source",
+        label_visibility="collapsed"
+    )
+    
+    if source == "Yahoo Finance":
+        fetch_mode()
+        return
+    
     # Upload area compacta
     uploaded_files = st.file_uploader(
         "Upload CSV files",
@@ -551,147 +1282,20 @@ def main():
         
         if ticker:
             try:
-                dfs_dict = {}
-                df_max_pain = None
-                df_gamma = None
-                
                 with st.spinner("Procesando archivos CSV..."):
-                    for file in uploaded_files:
-                        try:
-                            df = pd.read_csv(file)
-                            df.columns = df.columns.str.strip()
-                            cols_lower = [str(col).lower() for col in df.columns]
-                            
-                            # Detectar gamma_exposure - debe tener "gamma" en el nombre de columnas
-                            has_gamma = any('gamma' in col for col in cols_lower)
-                            has_call = any('call' in col for col in cols_lower)
-                            has_put = any('put' in col for col in cols_lower)
-                            
-                            if has_gamma and has_call and has_put:
-                                df_gamma = df
-                                # También procesar gamma como skew_analysis para mostrar en gráfico
-                                # Convertir gamma a formato skew
-                                cols_lower_dict = {col.lower(): col for col in df.columns}
-                                
-                                # Encontrar columnas de OI (obtener el nombre original, no la clave lowercase)
-                                call_oi_col = next((cols_lower_dict[col] for col in cols_lower_dict if 'call' in col and 'oi' in col), None)
-                                put_oi_col = next((cols_lower_dict[col] for col in cols_lower_dict if 'put' in col and 'oi' in col), None)
-                                strike_col = next((cols_lower_dict[col] for col in cols_lower_dict if 'strike' in col), None)
-                                
-                                if strike_col and call_oi_col and put_oi_col:
-                                    # Crear registros skew a partir de gamma
-                                    df_skew = pd.DataFrame()
-                                    df_skew['strike'] = df[strike_col]
-                                    df_skew['option_type'] = 'CALL'
-                                    df_skew['open_interest'] = df[call_oi_col]
-                                    
-                                    df_skew_put = pd.DataFrame()
-                                    df_skew_put['strike'] = df[strike_col]
-                                    df_skew_put['option_type'] = 'PUT'
-                                    df_skew_put['open_interest'] = df[put_oi_col]
-                                    
-                                    df_combined = pd.concat([df_skew, df_skew_put], ignore_index=True)
-                                    df_combined = clean_strikes(df_combined)
-                                    
-                                    try:
-                                        date_str = file.name.split('_')[-1].replace('.csv', '')
-                                        exp_date = datetime.strptime(date_str, '%Y-%m-%d')
-                                    except:
-                                        exp_date = datetime.now()
-                                    
-                                    dfs_dict[exp_date] = df_combined
-                                continue
-                            
-                            # Detectar max_pain
-                            has_total_loss = any('total_loss' in col or 'total loss' in col for col in cols_lower)
-                            
-                            if has_total_loss:
-                                df_max_pain = df
-                                continue
-                            
-                            # Procesar como archivo de OI Zones
-                            required_cols = ['strike', 'option_type', 'open_interest']
-                            # Buscar columnas case-insensitive
-                            cols_lower_dict = {col.lower(): col for col in df.columns}
-                            missing_cols = [col for col in required_cols if col not in cols_lower_dict]
-                            
-                            if missing_cols:
-                                st.error(f"❌ {file.name} - Faltan columnas: {missing_cols}")
-                                continue
-                            
-                            # Renombrar columnas a lowercase para procesamiento
-                            rename_dict = {cols_lower_dict[col]: col for col in required_cols if col in cols_lower_dict}
-                            df = df.rename(columns=rename_dict)
-                            
-                            df['option_type'] = df['option_type'].str.upper()
-                            df = clean_strikes(df)
-                            
-                            try:
-                                date_str = file.name.split('_')[-1].replace('.csv', '')
-                                exp_date = datetime.strptime(date_str, '%Y-%m-%d')
-                            except:
-                                exp_date = datetime.now()
-                            
-                            dfs_dict[exp_date] = df
-                        except Exception as e:
-                            st.error(f"❌ Error procesando {file.name}: {str(e)}")
+                    results = load_uploaded_files(
+                        [(file.name, file.getvalue()) for file in uploaded_files],
+                        PARSE_PROCESS_THRESHOLD
+                    )
+                
+                dfs_dict, df_max_pain, df_gamma, undated, errors = merge_parse_results(results)
+                for message in errors:
+                    st.error(message)
                 
                 if not dfs_dict:
                     st.error("❌ No se encontraron archivos skew_analysis válidos")
                 else:
-                    df_all = pd.concat(dfs_dict.values(), ignore_index=True)
-                    
-                    spot_auto = calculate_global_pivot(df_all)
-                    price_live = get_current_price(ticker)
-                    spot = price_live if price_live else spot_auto
-                    
-                    max_pain = find_max_pain(df_max_pain)
-                    gamma_exposure = find_gamma_exposure(df_gamma)
-                    
-                    # Métricas principales - solo las más importantes
-                    col1, col2, col3, col4, col5, col6, col7, col8 = st.columns(8)
-                    with col1:
-                        st.metric("Ticker", ticker)
-                    with col2:
-                        st.metric("SPOT", f"${spot:.2f}" if spot else "N/A")
-                    with col3:
-                        st.metric("PIVOT", f"${calculate_global_pivot(df_all):.2f}")
-                    with col4:
-                        st.metric("Vencimientos", len(dfs_dict))
-                    with col5:
-                        total_oi = df_all['open_interest'].sum()
-                        st.metric("Total OI", f"{int(total_oi):,}")
-                    with col6:
-                        call_oi = df_all[df_all['option_type'] == 'CALL']['open_interest'].sum()
-                        st.metric("OI CALLS", f"{int(call_oi):,}")
-                    with col7:
-                        put_oi = df_all[df_all['option_type'] == 'PUT']['open_interest'].sum()
-                        st.metric("OI PUTS", f"{int(put_oi):,}")
-                    with col8:
-                        total_strikes = len(df_all['strike'].unique())
-                        call_put_ratio = call_oi / put_oi if put_oi > 0 else 0
-                        st.metric("C/P Ratio", f"{call_put_ratio:.2f}")
-                    
-                    with st.spinner("Generating chart..."):
-                        fig = generate_chart(dfs_dict, ticker, spot, max_pain, gamma_exposure)
-                        
-                        buf = io.BytesIO()
-                        fig.savefig(buf, format='png', dpi=150, facecolor='black')
-                        buf.seek(0)
-                        
-                        st.pyplot(fig, use_container_width=True)
-                        
-                        col1, col2, col3 = st.columns([1, 2, 1])
-                        with col2:
-                            st.download_button(
-                                label="⬇️ Download PNG",
-                                data=buf,
-                                file_name=f"{ticker}_OI_Zones_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png",
-                                mime="image/png",
-                                use_container_width=True
-                            )
-                        
-                        plt.close(fig)
+                    render_results(dfs_dict, ticker, df_max_pain, df_gamma, undated)
             except Exception as e:
                 st.error(f"❌ Error: {str(e)}")
         else:
@@ -0,0 +1,184 @@
+import json
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app import HTTPChainProvider, YFRateLimitError, fetch_option_chains
+
+
+CHAIN = {
+    'calls': [
+        {'strike': 95.0, 'openInterest': 100},
+        {'strike': 100.0, 'openInterest': 250},
+        {'strike': 105.0, 'openInterest': None},
+    ],
+    'puts': [
+        {'strike': 95.0, 'openInterest': 300},
+        {'strike': 100.0, 'openInterest': 150},
+    ],
+}
+
+
+class FixtureServer:
+    """
+    Servidor local de fixtures grabados: rutas -> (status, cuerpo, retardo).
+    """
+    def __init__(self):
+        self.routes = {}
+        self.failures = {}
+        self.hits = {}
+        self._lock = threading.Lock()
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server._lock:
+                    server.hits[self.path] = server.hits.get(self.path, 0) + 1
+                    pending = server.failures.get(self.path, [])
+                    status = pending.pop(0) if pending else None
+                if status is not None:
+                    self.send_response(status)
+                    self.end_headers()
+                    return
+                if self.path not in server.routes:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body, delay = server.routes[self.path]
+                time.sleep(delay)
+                payload = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            
+            def log_message(self, *args):
+                pass
+        
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+    
+    def add(self, path, body, delay=0.0):
+        self.routes[path] = (body, delay)
+
+
+@pytest.fixture
+def server():
+    fixture = FixtureServer()
+    fixture.thread.start()
+    yield fixture
+    fixture.httpd.shutdown()
+    fixture.httpd.server_close()
+
+
+def fetch(server, **kwargs):
+    provider = HTTPChainProvider(server.url, timeout=2.0)
+    options = dict(rate_limit=0, backoff=0.01, timeout=5.0)
+    options.update(kwargs)
+    return fetch_option_chains('SPY', provider, **options)
+
+
+def test_normalizes_to_oi_zones_format(server):
+    server.add('/SPY/expirations', ['2026-10-23'])
+    server.add('/SPY/2026-10-23', CHAIN)
+    
+    dfs_dict, errors = fetch(server)
+    
+    assert errors == {}
+    df = dfs_dict[datetime(2026, 10, 23)]
+    assert list(df.columns) == ['strike', 'option_type', 'open_interest']
+    assert sorted(df['option_type'].unique()) == ['CALL', 'PUT']
+    calls = df[df['option_type'] == 'CALL'].set_index('strike')['open_interest']
+    assert calls[100.0] == 250
+    assert calls[105.0] == 0
+
+
+def test_results_follow_expiration_order(server):
+    expirations = ['2026-10-23', '2026-10-30', '2026-11-06']
+    server.add('/SPY/expirations', expirations)
+    # La primera responde la última
+    server.add('/SPY/2026-10-23', CHAIN, delay=0.3)
+    server.add('/SPY/2026-10-30', CHAIN)
+    server.add('/SPY/2026-11-06', CHAIN)
+    
+    dfs_dict, errors = fetch(server)
+    
+    assert errors == {}
+    assert [exp.strftime('%Y-%m-%d') for exp in dfs_dict] == expirations
+
+
+def test_failed_expirations_are_reported_without_losing_others(server):
+    server.add('/SPY/expirations', ['2026-10-23', '2026-10-30', 'bad'])
+    server.add('/SPY/2026-10-23', CHAIN)
+    
+    dfs_dict, errors = fetch(server)
+    
+    assert [exp.strftime('%Y-%m-%d') for exp in dfs_dict] == ['2026-10-23']
+    assert set(errors) == {'2026-10-30', 'bad'}
+    assert '404' in errors['2026-10-30']
+    assert '/SPY/bad' not in server.hits
+
+
+def test_transient_errors_are_retried(server):
+    server.add('/SPY/2026-10-23', CHAIN)
+    server.failures['/SPY/2026-10-23'] = [503, 429]
+    
+    dfs_dict, errors = fetch(server, expirations=['2026-10-23'], retries=3)
+    
+    assert errors == {}
+    assert len(dfs_dict) == 1
+    assert server.hits['/SPY/2026-10-23'] == 3
+
+
+def test_permanent_errors_are_not_retried(server):
+    dfs_dict, errors = fetch(server, expirations=['2026-10-23'], retries=3)
+    
+    assert dfs_dict == {}
+    assert '2026-10-23' in errors
+    assert server.hits['/SPY/2026-10-23'] == 1
+
+
+def test_retries_stop_at_expiration_deadline(server):
+    server.failures['/SPY/2026-10-23'] = [503] * 10
+    
+    start = time.monotonic()
+    dfs_dict, errors = fetch(server, expirations=['2026-10-23'], retries=10, backoff=0.2, timeout=0.5)
+    
+    assert dfs_dict == {}
+    assert 'timeout' in errors['2026-10-23']
+    assert time.monotonic() - start < 2.0
+    assert server.hits['/SPY/2026-10-23'] < 11
+
+
+class RateLimitedProvider:
+    """
+    Proveedor falso que responde como yfinance ante un 429 las primeras `failures` veces.
+    """
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+    
+    def expirations(self, ticker):
+        return ['2026-10-23']
+    
+    def fetch(self, ticker, expiration):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise YFRateLimitError()
+        return CHAIN['calls'], CHAIN['puts']
+
+
+@pytest.mark.skipif(YFRateLimitError is None, reason="yfinance sin YFRateLimitError")
+def test_yfinance_rate_limit_is_retried():
+    provider = RateLimitedProvider(failures=2)
+    
+    dfs_dict, errors = fetch_option_chains('SPY', provider, rate_limit=0, backoff=0.01, retries=3)
+    
+    assert errors == {}
+    assert len(dfs_dict) == 1
+    assert provider.calls == 3
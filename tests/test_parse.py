@@ -0,0 +1,131 @@
+import io
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import app
+from app import merge_parse_results, parse_uploaded_file, parse_uploaded_files
+
+
+def oi_csv(call_oi=100, put_oi=200):
+    return (
+        "strike,option_type,open_interest\n"
+        f"95,call,{call_oi}\n100,call,{call_oi}\n105,call,{call_oi}\n"
+        f"95,put,{put_oi}\n100,put,{put_oi}\n105,put,{put_oi}\n"
+    ).encode()
+
+
+GAMMA_CSV = (
+    b"Strike,CALL_Gamma,PUT_Gamma,CALL_OI,PUT_OI\n"
+    b"95,0.1,0.2,10,20\n100,0.5,0.4,30,40\n105,0.2,0.1,50,60\n"
+)
+
+MAX_PAIN_CSV = b"Strike,Total Loss\n95,300\n100,100\n105,200\n"
+
+
+def sequential(files):
+    """
+    Referencia: parseo uno tras otro, como el bucle original de main().
+    """
+    return [parse_uploaded_file(name, data) for name, data in files]
+
+
+def test_results_keep_input_order_when_files_finish_out_of_order(monkeypatch):
+    original = app.parse_uploaded_file
+    
+    def slow_first(name, data):
+        if name.startswith('SPY_a'):
+            time.sleep(0.3)
+        return original(name, data)
+    
+    monkeypatch.setattr(app, 'parse_uploaded_file', slow_first)
+    files = [(f"SPY_{letter}_2026-10-{day}.csv", oi_csv()) for letter, day in (('a', 23), ('b', 24), ('c', 25))]
+    
+    results = parse_uploaded_files(files)
+    
+    assert [r['name'] for r in results] == [name for name, _ in files]
+    assert [r['exp_date'] for r in results] == [datetime(2026, 10, d) for d in (23, 24, 25)]
+
+
+def test_error_messages_match_sequential_loop():
+    bad_name = 'SPY_skew_2026-10-23.csv'
+    empty_name = 'SPY_empty_2026-10-24.csv'
+    files = [(bad_name, b"strike,volume\n100,5\n"), (empty_name, b"")]
+    
+    results = parse_uploaded_files(files)
+    
+    with pytest.raises(Exception) as read_error:
+        pd.read_csv(io.BytesIO(b""))
+    assert results[0]['error'] == f"❌ {bad_name} - Faltan columnas: ['option_type', 'open_interest']"
+    assert results[1]['error'] == f"❌ Error procesando {empty_name}: {str(read_error.value)}"
+    assert [r['error'] for r in results] == [r['error'] for r in sequential(files)]
+
+
+def test_classification_and_last_file_wins_match_sequential_loop():
+    files = [
+        ('SPY_skew_2026-10-23.csv', oi_csv(call_oi=1)),
+        ('SPY_gamma_2026-10-30.csv', GAMMA_CSV),
+        ('SPY_maxpain_2026-10-23.csv', MAX_PAIN_CSV),
+        ('SPY_skew2_2026-10-23.csv', oi_csv(call_oi=7)),
+        ('SPY_maxpain2_2026-10-23.csv', MAX_PAIN_CSV.replace(b'100,100', b'100,999')),
+    ]
+    
+    dfs_dict, df_max_pain, df_gamma, undated, errors = merge_parse_results(parse_uploaded_files(files))
+    expected = merge_parse_results(sequential(files))
+    
+    assert errors == []
+    assert undated == set()
+    assert list(dfs_dict) == list(expected[0]) == [datetime(2026, 10, 23), datetime(2026, 10, 30)]
+    for exp_date in dfs_dict:
+        pd.testing.assert_frame_equal(dfs_dict[exp_date], expected[0][exp_date])
+    # El último archivo OI del mismo vencimiento gana
+    calls = dfs_dict[datetime(2026, 10, 23)]
+    assert set(calls[calls['option_type'] == 'CALL']['open_interest']) == {7}
+    # Gamma se usa como gamma_exposure y como vencimiento
+    assert list(df_gamma.columns) == list(expected[2].columns)
+    assert sorted(dfs_dict[datetime(2026, 10, 30)]['option_type'].unique()) == ['CALL', 'PUT']
+    # El último max_pain gana
+    pd.testing.assert_frame_equal(df_max_pain, expected[1])
+    assert 999 in df_max_pain['Total Loss'].values
+
+
+def test_undated_files_get_distinct_keys():
+    files = [('SPY_a.csv', oi_csv(call_oi=1)), ('SPY_b.csv', oi_csv(call_oi=2))]
+    
+    dfs_dict, _, _, undated, errors = merge_parse_results(parse_uploaded_files(files))
+    
+    assert errors == []
+    assert len(dfs_dict) == 2
+    assert undated == set(dfs_dict)
+
+
+class BrokenPool:
+    """
+    Pool de procesos roto: falla al enviar o al recoger el resultado.
+    """
+    def __init__(self, fail_on_submit):
+        self.fail_on_submit = fail_on_submit
+    
+    def submit(self, fn, *args):
+        if self.fail_on_submit:
+            raise BrokenProcessPool('A process in the process pool was terminated abruptly')
+        future = Future()
+        future.set_exception(BrokenProcessPool('A process in the process pool was terminated abruptly'))
+        return future
+
+
+@pytest.mark.parametrize('fail_on_submit', [True, False])
+def test_broken_process_pool_falls_back_to_threads(fail_on_submit):
+    files = [('SPY_big_2026-10-23.csv', oi_csv()), ('SPY_small_2026-10-24.csv', b"strike,option_type,open_interest\n")]
+    broken = []
+    
+    results = parse_uploaded_files(files, process_threshold=100, process_executor=BrokenPool(fail_on_submit),
+                                   on_broken_pool=lambda: broken.append(True))
+    
+    assert results[0]['error'] is None
+    assert len(results[0]['df']) == 6
+    assert broken == [True]
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from app import EXPIRED_BUCKET, UNDATED_BUCKET, _parse_dte_buckets, build_rollups
+
+
+TODAY = datetime(2026, 10, 19)
+
+
+def chain(call_oi, put_oi, strikes=(95.0, 100.0, 105.0)):
+    return pd.DataFrame({
+        'strike': list(strikes) * 2,
+        'option_type': ['CALL'] * len(strikes) + ['PUT'] * len(strikes),
+        'open_interest': list(call_oi) + list(put_oi),
+    })
+
+
+def oi(df, option_type):
+    return df[df['option_type'] == option_type].set_index('strike')['open_interest'].to_dict()
+
+
+def test_expirations_in_same_bucket_are_summed_on_shared_grid():
+    dfs_dict = {
+        TODAY + timedelta(days=60): chain([1, 2, 3], [4, 5, 6]),
+        TODAY + timedelta(days=90): chain([10, 20], [30, 40], strikes=(100.0, 110.0)),
+    }
+    
+    rollups, members = build_rollups(dfs_dict, today=TODAY)
+    
+    assert list(rollups) == ['Trimestral']
+    assert members['Trimestral'] == sorted(dfs_dict)
+    assert oi(rollups['Trimestral'], 'CALL') == {95.0: 1, 100.0: 12, 105.0: 3, 110.0: 20}
+    assert oi(rollups['Trimestral'], 'PUT') == {95.0: 4, 100.0: 35, 105.0: 6, 110.0: 40}
+
+
+def test_past_expirations_are_not_folded_into_0dte():
+    expired = TODAY - timedelta(days=30)
+    dfs_dict = {expired: chain([1, 1, 1], [1, 1, 1]), TODAY: chain([5, 5, 5], [5, 5, 5])}
+    
+    rollups, members = build_rollups(dfs_dict, today=TODAY)
+    
+    assert list(rollups) == [EXPIRED_BUCKET, '0DTE']
+    assert members[EXPIRED_BUCKET] == [expired]
+    assert members['0DTE'] == [TODAY]
+    assert oi(rollups['0DTE'], 'CALL')[100.0] == 5
+
+
+def test_undated_files_get_their_own_bucket():
+    undated_key = datetime(2026, 10, 19, 14, 3, 27)
+    dfs_dict = {TODAY: chain([5, 5, 5], [5, 5, 5]), undated_key: chain([1, 1, 1], [1, 1, 1])}
+    
+    rollups, members = build_rollups(dfs_dict, today=TODAY, undated=(undated_key,))
+    
+    assert list(rollups) == ['0DTE', UNDATED_BUCKET]
+    assert members[UNDATED_BUCKET] == [undated_key]
+
+
+def test_custom_buckets_are_used():
+    buckets = _parse_dte_buckets('Corto:10, Largo')
+    dfs_dict = {
+        TODAY + timedelta(days=3): chain([1, 1, 1], [1, 1, 1]),
+        TODAY + timedelta(days=200): chain([2, 2, 2], [2, 2, 2]),
+    }
+    
+    rollups, members = build_rollups(dfs_dict, buckets=buckets, today=TODAY)
+    
+    assert buckets == (('Corto', 10), ('Largo', None))
+    assert list(rollups) == ['Corto', 'Largo']
+
+
+def test_invalid_bucket_spec_falls_back_to_defaults():
+    assert _parse_dte_buckets(None) is None
+    assert _parse_dte_buckets('Corto:x') is None
+    assert _parse_dte_buckets('Corto:-1') is None
+    assert _parse_dte_buckets(':5') is None